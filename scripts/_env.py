@@ -0,0 +1,17 @@
+"""Environment loading shared by the scripts."""
+import os
+
+def load_env():
+    """Load .env into os.environ once per process tree
+    
+    Variables that are already set (e.g. by CI) take precedence over .env.
+    A marker variable is set afterwards so later imports and child processes
+    skip re-reading the file.
+    """
+    if os.environ.get('_ENV_LOADED'):
+        return
+    
+    from dotenv import load_dotenv
+    
+    load_dotenv(override=False)
+    os.environ['_ENV_LOADED'] = '1'
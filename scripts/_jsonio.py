@@ -0,0 +1,22 @@
+"""JSON helpers shared by the scripts.
+
+Uses orjson when it is installed and falls back to the standard library,
+so the scripts keep working in a bare environment.
+"""
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    import json
+
+def loads(data):
+    """Parse JSON from str or bytes"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dumps(obj):
+    """Serialize obj to 2-space indented UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
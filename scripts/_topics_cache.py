@@ -0,0 +1,111 @@
+"""Cache of the parsed topics.json.
+
+load_topics() keeps the parsed file in memory keyed by its mtime and
+size, so select, generate and update steps in one process only parse it
+once.
+The parsed data is also pickled to .cache/topics.pkl so the next
+process (e.g. generate_draft.py after select_topic.py in CI) can skip
+parsing while the file is unchanged.
+
+Alongside the data the cache keeps an index of topic id -> position in
+data['topics'], available through load_topics_indexed().
+
+Callers that modify the returned data must write it back with
+save_topics(), which refreshes both caches, or drops the in-memory
+entry if the write fails so unsaved edits are never served.
+"""
+import os
+import pickle
+from pathlib import Path
+
+from _jsonio import dumps, loads
+
+PICKLE_PATH = Path('.cache/topics.pkl')
+
+# absolute path -> ((st_mtime_ns, st_size), data, index)
+_cache = {}
+
+def _build_index(data):
+    return {t['id']: i for i, t in enumerate(data['topics'])}
+
+def _stamp(st):
+    # Size catches edits within one tick on filesystems with coarse mtimes
+    return st.st_mtime_ns, st.st_size
+
+def _load_pickle(key, stamp):
+    try:
+        with open(PICKLE_PATH, 'rb') as f:
+            cached_key, cached_stamp, data, index = pickle.load(f)
+    except (OSError, EOFError, pickle.PickleError, ValueError):
+        return None
+    
+    if cached_key == key and cached_stamp == stamp:
+        return data, index
+    return None
+
+def _remember(key, stamp, data, index):
+    _cache[key] = (stamp, data, index)
+    try:
+        PICKLE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(PICKLE_PATH, 'wb') as f:
+            pickle.dump((key, stamp, data, index), f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        # The on-disk cache is only an optimization
+        pass
+
+def load_topics_indexed(path):
+    """Return (data, index) for topics.json, reusing a cached copy if the file is unchanged
+    
+    index maps each topic id to its position in data['topics'].
+    """
+    key = os.path.abspath(path)
+    
+    # Open first and fstat the handle: one lookup covers both the stamp
+    # check and the read, and a missing file raises FileNotFoundError
+    with open(path, 'rb') as f:
+        stamp = _stamp(os.fstat(f.fileno()))
+        
+        cached = _cache.get(key)
+        if cached and cached[0] == stamp:
+            return cached[1], cached[2]
+        
+        loaded = _load_pickle(key, stamp)
+        if loaded is None:
+            data = loads(f.read())
+            index = _build_index(data)
+            _remember(key, stamp, data, index)
+        else:
+            data, index = loaded
+            _cache[key] = (stamp, data, index)
+    
+    return data, index
+
+def load_topics(path):
+    """Return parsed topics.json, reusing a cached copy if the file is unchanged"""
+    return load_topics_indexed(path)[0]
+
+def save_topics(path, data):
+    """Atomically write topics.json and refresh the caches
+    
+    The data is written to a temporary file, fsynced once and renamed over
+    the original, so an interrupted run never leaves a truncated file.
+    """
+    path = Path(path)
+    key = os.path.abspath(path)
+    tmp = path.with_suffix(path.suffix + '.tmp')
+    
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(dumps(data))
+            f.flush()
+            os.fsync(f.fileno())
+            stamp = _stamp(os.fstat(f.fileno()))
+        
+        os.replace(tmp, path)
+    except BaseException:
+        # data may hold edits that never reached disk
+        _cache.pop(key, None)
+        tmp.unlink(missing_ok=True)
+        raise
+    
+    _remember(key, stamp, data, _build_index(data))
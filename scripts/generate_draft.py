@@ -1,104 +1,358 @@
 #!/usr/bin/env python3
+import asyncio
 import os
-import json
+import random
 import sys
 from datetime import datetime
 from pathlib import Path
-from anthropic import Anthropic
-from dotenv import load_dotenv
+
+from _env import load_env
+from _jsonio import dumps, loads
+from _topics_cache import load_topics_indexed, save_topics
 
 # Load environment variables
-load_dotenv()
+load_env()
+
+MODEL = "claude-3-haiku-20240307"
+MAX_TOKENS = 4096
+DYNAMIC_SENTINEL = '{{DYNAMIC}}'
+BATCH_POLL_INTERVAL = 20  # seconds between batch status checks
+LAUNCH_DELAY = 0.2  # seconds between concurrent requests, stays inside rate limits
+CACHE_MIN_TOKENS = 2048  # shortest cacheable prompt prefix for Claude 3 Haiku
+CHARS_PER_TOKEN = 4  # rough estimate for English prose
+RETRY_ATTEMPTS = 3
+RETRY_STATUS_CODES = {408, 429, 500, 502, 503, 529}
+RETRY_ERROR_TYPES = {'overloaded_error', 'api_error'}
+
+# Shared AsyncAnthropic client, see get_client()
+_client = None
 
 def load_selected_topic():
     """Load the topic selected by select_topic.py"""
     topic_file = Path('.selected_topic.json')
     
-    if not topic_file.exists():
+    try:
+        return loads(topic_file.read_bytes())
+    except FileNotFoundError:
         print("❌ No selected topic found. Run select_topic.py first.")
         sys.exit(1)
-    
-    with open(topic_file, 'r') as f:
-        return json.load(f)
 
 def load_prompt_template():
-    """Load and return the prompt template"""
+    """Load the prompt template and return (prefix, dynamic)
+    
+    Everything before the {{DYNAMIC}} line is the static prefix shared by
+    every topic; the rest holds the topic placeholders. Templates without
+    the sentinel have an empty prefix.
+    """
     # Check for custom template path from environment
     # Default to V2 if not specified
     template_path_str = os.getenv('PROMPT_TEMPLATE_PATH', 'config/prompt_template_v2.txt')
     template_path = Path(template_path_str)
     
-    if not template_path.exists():
+    try:
+        template = template_path.read_text()
+    except FileNotFoundError:
         print("❌ Prompt template not found")
         sys.exit(1)
     
-    with open(template_path, 'r') as f:
-        return f.read()
+    prefix, sep, dynamic = template.partition(DYNAMIC_SENTINEL)
+    if not sep:
+        return '', template
+    return prefix.strip(), dynamic.strip()
 
-def generate_draft(topic):
-    """Generate blog draft using Anthropic API"""
+def get_client():
+    """Return the process-wide Anthropic client, exiting if no API key is configured
+    
+    The client is created on first use and shared by every request, so all
+    drafts in a run reuse one HTTP/2 connection pool instead of paying for
+    a new TLS handshake each time.
+    """
+    global _client
+    if _client is not None:
+        return _client
     
-    # Initialize Anthropic client
     api_key = os.getenv('ANTHROPIC_API_KEY')
     if not api_key:
         print("❌ ANTHROPIC_API_KEY not found in environment")
         sys.exit(1)
     
-    client = Anthropic(api_key=api_key)
+    # Imported here so the fast-fail paths above don't pay for loading the SDK
+    import httpx
+    from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
     
-    # Load and format prompt
-    template = load_prompt_template()
-    prompt = template.replace("{title}", topic['title']) \
-                     .replace("{category}", topic['category']) \
-                     .replace("{keywords}", ', '.join(topic['keywords']))
+    # Retries are handled by with_retries so they don't compound
+    _client = AsyncAnthropic(
+        api_key=api_key,
+        max_retries=0,
+        http_client=DefaultAsyncHttpxClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=20)
+        )
+    )
+    return _client
+
+async def with_retries(call):
+    """Await call(), retrying transient API errors with jittered exponential backoff
+    
+    Errors sent mid-stream carry the stream's HTTP status (200), so they are
+    also matched on the error type in the response body. Honors the
+    Retry-After header when the API sends one.
+    """
+    from anthropic import APIConnectionError, APIStatusError
+    
+    for attempt in range(RETRY_ATTEMPTS):
+        try:
+            return await call()
+        except (APIStatusError, APIConnectionError) as e:
+            status = getattr(e, 'status_code', None)
+            body = getattr(e, 'body', None)
+            error_type = body.get('error', {}).get('type') if isinstance(body, dict) else None
+            retryable = (status is None or status in RETRY_STATUS_CODES
+                         or error_type in RETRY_ERROR_TYPES)
+            if attempt == RETRY_ATTEMPTS - 1 or not retryable:
+                raise
+            
+            delay = 2 ** attempt + random.random()
+            if status is not None:
+                try:
+                    delay = max(delay, float(e.response.headers.get('retry-after', 0)))
+                except ValueError:
+                    pass
+            
+            print(f"⚠️  API error ({error_type or status or 'connection'}), retrying in {delay:.1f}s...")
+            await asyncio.sleep(delay)
+
+def format_topic(text, topic):
+    """Fill the template placeholders with topic details"""
+    return text.replace("{title}", topic['title']) \
+               .replace("{category}", topic['category']) \
+               .replace("{keywords}", ', '.join(topic['keywords']))
+
+def build_prompt(template, topic, cache=False):
+    """Build the user message content for a topic
+    
+    The static prefix goes in its own block. With cache=True (see
+    use_prompt_cache) it is marked for prompt caching.
+    """
+    prefix, dynamic = template
+    blocks = [{"type": "text", "text": format_topic(dynamic, topic)}]
+    if prefix:
+        block = {"type": "text", "text": prefix}
+        if cache:
+            block["cache_control"] = {"type": "ephemeral"}
+        blocks.insert(0, block)
+    return blocks
+
+def use_prompt_cache(template, topic_count):
+    """Whether caching the template prefix can pay off in this run
+    
+    Cache writes cost extra and expire after a few minutes, so this needs
+    several requests sharing the prefix, and a prefix long enough for the
+    model to cache at all.
+    """
+    prefix, _ = template
+    return topic_count > 1 and len(prefix) // CHARS_PER_TOKEN >= CACHE_MIN_TOKENS
+
+async def generate_draft(client, template, topic, now_iso, cache=False, started=None):
+    """Stream a blog draft from the Anthropic API straight into draft.md
+    
+    Text is streamed into draft.md.tmp, which is renamed to draft.md once
+    the response completes. On failure the partial file and the empty
+    draft directory are removed before the error is re-raised.
+    If given, the started event is set once text starts arriving (or the
+    request fails).
+    Returns (draft_dir, content, usage, word_count).
+    """
+    
+    # Format prompt
+    prompt = build_prompt(template, topic, cache)
     
     print(f"\n🤖 Generating draft for: {topic['title']}")
     print(f"📊 Estimated tokens: ~8000")
     print(f"⏱️  This will take 30-60 seconds...\n")
     
+    draft_dir = get_draft_dir(topic, now_iso)
+    draft_file = draft_dir / 'draft.md'
+    tmp_file = draft_dir / 'draft.md.tmp'
+    
+    async def stream_to_file():
+        chunks = []
+        
+        # Call Anthropic API, writing text to disk as it arrives. The 64 KiB
+        # buffer holds a typical draft, so it is flushed once when the file closes
+        with open(tmp_file, 'wb', buffering=1 << 16) as f:
+            async with client.messages.stream(
+                model=MODEL,
+                max_tokens=MAX_TOKENS,
+                temperature=0.7,  # Slightly creative but focused
+                messages=[
+                    {"role": "user", "content": prompt}
+                ]
+            ) as stream:
+                async for text in stream.text_stream:
+                    if started is not None:
+                        started.set()
+                    f.write(text.encode('utf-8'))
+                    chunks.append(text)
+                
+                return chunks, await stream.get_final_message()
+    
+    # A retry reopens the temp file, discarding any partial output
     try:
-        # Call Anthropic API
-        message = client.messages.create(
-            model="claude-3-haiku-20240307",
-            max_tokens=4096,
-            temperature=0.7,  # Slightly creative but focused
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
+        chunks, message = await with_retries(stream_to_file)
+        os.replace(tmp_file, draft_file)
+    except BaseException:
+        tmp_file.unlink(missing_ok=True)
+        try:
+            draft_dir.rmdir()
+        except OSError:
+            # Not empty, e.g. an earlier draft for this topic today
+            pass
+        raise
+    finally:
+        if started is not None:
+            started.set()
+    
+    draft_content = ''.join(chunks)
+    word_count = len(draft_content.split())
+    char_count = len(draft_content)
+    
+    print(f"✅ Draft generated: {topic['title']}")
+    print(f"   Words: {word_count}")
+    print(f"   Characters: {char_count:,}")
+    print(f"   Tokens used: ~{message.usage.input_tokens + message.usage.output_tokens}")
+    print(f"   Cached prompt tokens read: {message.usage.cache_read_input_tokens or 0}")
+    print(f"\n💾 Draft saved to: {draft_file}")
+    
+    return draft_dir, draft_content, message.usage, word_count
+
+async def generate_drafts(topics, now_iso, max_concurrency=4):
+    """Generate drafts for several topics concurrently
+    
+    Requests are launched LAUNCH_DELAY apart and at most max_concurrency
+    are in flight at once. When the template prefix is cached, the rest
+    wait until the first response starts streaming, by which point its
+    prefix is in the cache, so they read it instead of each writing it.
+    Each topic is saved as soon as its draft arrives. Returns a list of
+    draft directories for successful topics.
+    """
+    
+    template = load_prompt_template()
+    client = get_client()
+    sem = asyncio.Semaphore(max_concurrency)
+    cache = use_prompt_cache(template, len(topics))
+    first_streaming = asyncio.Event()
+    if not cache:
+        first_streaming.set()
+    
+    async def run(topic, delay, first):
+        if not first:
+            await first_streaming.wait()
+        await asyncio.sleep(delay)
+        async with sem:
+            draft_dir, content, usage, word_count = await generate_draft(
+                client, template, topic, now_iso, cache,
+                started=first_streaming if first else None
+            )
         
-        draft_content = message.content[0].text
+        save_metadata(draft_dir, topic, content, usage, word_count, now_iso)
+        update_topic_status(topic, draft_dir, now_iso)
+        return draft_dir
+    
+    results = await asyncio.gather(
+        *(run(topic, i * LAUNCH_DELAY, i == 0) for i, topic in enumerate(topics)),
+        return_exceptions=True
+    )
+    
+    draft_dirs = []
+    for topic, result in zip(topics, results):
+        if isinstance(result, Exception):
+            print(f"❌ Error generating draft for {topic['title']}: {result}")
+        else:
+            draft_dirs.append(result)
+    
+    return draft_dirs
+
+async def generate_drafts_batch(topics):
+    """Generate drafts for several topics with the Message Batches API
+    
+    Batches are billed at half the price of individual requests but may
+    take a while to process, so this polls until the batch has ended.
+    Returns a dict mapping topic id to (content, usage).
+    """
+    
+    template = load_prompt_template()
+    client = get_client()
+    from anthropic.types.message_create_params import MessageCreateParamsNonStreaming
+    from anthropic.types.messages.batch_create_params import Request
+    cache = use_prompt_cache(template, len(topics))
+    
+    requests = [
+        Request(
+            custom_id=topic['id'],
+            params=MessageCreateParamsNonStreaming(
+                model=MODEL,
+                max_tokens=MAX_TOKENS,
+                temperature=0.7,
+                messages=[
+                    {"role": "user", "content": build_prompt(template, topic, cache)}
+                ]
+            )
+        )
+        for topic in topics
+    ]
+    
+    try:
+        batch = await with_retries(lambda: client.messages.batches.create(requests=requests))
+        print(f"\n📦 Submitted batch {batch.id} with {len(requests)} topics")
         
-        # Calculate stats
-        word_count = len(draft_content.split())
-        char_count = len(draft_content)
+        while batch.processing_status != 'ended':
+            await asyncio.sleep(BATCH_POLL_INTERVAL)
+            batch = await with_retries(lambda: client.messages.batches.retrieve(batch.id))
+            counts = batch.request_counts
+            print(f"   ⏳ {counts.processing} processing, "
+                  f"{counts.succeeded} succeeded, {counts.errored} errored")
         
-        print(f"✅ Draft generated!")
-        print(f"   Words: {word_count}")
-        print(f"   Characters: {char_count:,}")
-        print(f"   Tokens used: ~{message.usage.input_tokens + message.usage.output_tokens}")
+        results = {}
+        async for entry in await client.messages.batches.results(batch.id):
+            if entry.result.type == 'succeeded':
+                message = entry.result.message
+                results[entry.custom_id] = (message.content[0].text, message.usage)
+            else:
+                print(f"❌ Draft for {entry.custom_id} failed: {entry.result.type}")
         
-        return draft_content, message.usage
+        print(f"✅ Batch complete: {len(results)}/{len(requests)} drafts generated")
+        return results
         
     except Exception as e:
-        print(f"❌ Error generating draft: {e}")
+        print(f"❌ Error generating batch: {e}")
         sys.exit(1)
 
-def save_draft(topic, content, usage):
+def get_draft_dir(topic, now_iso):
+    """Create and return the draft directory for a topic"""
+    # The date part of an ISO timestamp is YYYY-MM-DD
+    draft_dir = Path(f"drafts/{now_iso[:10]}-{topic['id']}")
+    draft_dir.mkdir(parents=True, exist_ok=True)
+    return draft_dir
+
+def save_draft(topic, content, usage, now_iso):
     """Save draft and metadata to appropriate directory"""
     
-    # Create draft directory
-    date_str = datetime.now().strftime('%Y-%m-%d')
-    draft_dir = Path(f"drafts/{date_str}-{topic['id']}")
-    draft_dir.mkdir(parents=True, exist_ok=True)
+    draft_dir = get_draft_dir(topic, now_iso)
     
     # Save draft content
     draft_file = draft_dir / 'draft.md'
-    with open(draft_file, 'w', encoding='utf-8') as f:
-        f.write(content)
+    draft_file.write_bytes(content.encode('utf-8'))
     
     print(f"\n💾 Draft saved to: {draft_file}")
     
+    save_metadata(draft_dir, topic, content, usage, len(content.split()), now_iso)
+    
+    return draft_dir
+
+def save_metadata(draft_dir, topic, content, usage, word_count, now_iso):
+    """Save metadata.json next to a draft"""
+    
     # Create metadata
     metadata = {
         'topic_id': topic['id'],
@@ -106,43 +360,39 @@ def save_draft(topic, content, usage):
         'category': topic['category'],
         'difficulty': topic['difficulty'],
         'keywords': topic['keywords'],
-        'generated_at': datetime.now().isoformat(),
-        'word_count': len(content.split()),
+        'generated_at': now_iso,
+        'word_count': word_count,
         'char_count': len(content),
-        'model_used': 'claude-3-haiku-20240307',
+        'model_used': MODEL,
         'tokens_input': usage.input_tokens,
         'tokens_output': usage.output_tokens,
+        'tokens_cache_read': usage.cache_read_input_tokens or 0,
         'status': 'draft'
     }
     
     metadata_file = draft_dir / 'metadata.json'
-    with open(metadata_file, 'w') as f:
-        json.dump(metadata, f, indent=2)
+    metadata_file.write_bytes(dumps(metadata))
     
     print(f"📋 Metadata saved to: {metadata_file}")
-    
-    return draft_dir
 
-def update_topic_status(topic, draft_dir):
+def update_topic_status(topic, draft_dir, now_iso):
     """Mark topic as used in topics.json"""
     
     topics_path = Path('config/topics.json')
     
-    with open(topics_path, 'r') as f:
-        data = json.load(f)
+    data, index = load_topics_indexed(topics_path)
     
     # Find and update topic
-    for t in data['topics']:
-        if t['id'] == topic['id']:
-            t['status'] = 'used'
-            t['used_at'] = datetime.now().isoformat()
-            t['draft_path'] = str(draft_dir)
-            break
+    if topic['id'] in index:
+        data['topics'][index[topic['id']]].update({
+            'status': 'used',
+            'used_at': now_iso,
+            'draft_path': str(draft_dir)
+        })
     
-    data['last_updated'] = datetime.now().isoformat()
+    data['last_updated'] = now_iso
     
-    with open(topics_path, 'w') as f:
-        json.dump(data, f, indent=2)
+    save_topics(topics_path, data)
     
     print(f"✅ Topic marked as 'used' in topics.json")
 
@@ -151,26 +401,49 @@ def main():
     print("  FLUTTER BLOG DRAFT GENERATOR")
     print("=" * 60)
     
-    # Load selected topic
-    topic = load_selected_topic()
+    # One timestamp for every draft, metadata file and topic update in this run
+    now_iso = datetime.now().isoformat()
     
-    # Generate draft
-    content, usage = generate_draft(topic)
+    # DRAFT_COUNT > 1 selects several topics in one pass; otherwise use
+    # the topic picked by select_topic.py
+    count = int(os.getenv('DRAFT_COUNT', '1'))
+    if count > 1:
+        from select_topic import select_next_topics
+        topics = select_next_topics(count)
+    else:
+        topics = [load_selected_topic()]
     
-    # Save draft and metadata
-    draft_dir = save_draft(topic, content, usage)
+    # DRAFT_MODE=batch submits through the Message Batches API,
+    # otherwise drafts are generated concurrently
+    if os.getenv('DRAFT_MODE') == 'batch':
+        results = asyncio.run(generate_drafts_batch(topics))
+        
+        draft_dirs = []
+        for topic in topics:
+            if topic['id'] not in results:
+                continue
+            content, usage = results[topic['id']]
+            draft_dir = save_draft(topic, content, usage, now_iso)
+            update_topic_status(topic, draft_dir, now_iso)
+            draft_dirs.append(draft_dir)
+    else:
+        max_concurrency = int(os.getenv('DRAFT_CONCURRENCY', '4'))
+        draft_dirs = asyncio.run(generate_drafts(topics, now_iso, max_concurrency))
     
-    # Update topic status
-    update_topic_status(topic, draft_dir)
+    if not draft_dirs:
+        sys.exit(1)
     
     # Clean up temp file
-    Path('.selected_topic.json').unlink()
+    if count <= 1:
+        Path('.selected_topic.json').unlink()
     
     print("\n" + "=" * 60)
     print("  ✅ GENERATION COMPLETE")
     print("=" * 60)
     print(f"\nNext steps:")
-    print(f"1. Review draft at: {draft_dir}/draft.md")
+    print(f"1. Review drafts at:")
+    for draft_dir in draft_dirs:
+        print(f"   - {draft_dir}/draft.md")
     print(f"2. Edit and personalize the content")
     print(f"3. Test code examples")
     print(f"4. Publish to Medium when ready")
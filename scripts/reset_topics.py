@@ -1,16 +1,16 @@
-import json
 from pathlib import Path
 from datetime import datetime
 
+from _topics_cache import load_topics, save_topics
+
 def reset_topics(file_path):
     path = Path(file_path)
-    if not path.exists():
+    try:
+        data = load_topics(path)
+    except FileNotFoundError:
         print(f"File {file_path} not found.")
         return
 
-    with open(path, 'r') as f:
-        data = json.load(f)
-
     for topic in data.get('topics', []):
         topic['status'] = 'available'
         # Remove usage keys
@@ -20,8 +20,7 @@ def reset_topics(file_path):
 
     data['last_updated'] = datetime.now().isoformat()
 
-    with open(path, 'w') as f:
-        json.dump(data, f, indent=2)
+    save_topics(path, data)
     
     print(f"Successfully reset {len(data['topics'])} topics in {file_path}")
 
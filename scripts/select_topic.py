@@ -1,23 +1,25 @@
 #!/usr/bin/env python3
-import json
-import random
 import sys
 from datetime import datetime
 from pathlib import Path
 
-def select_next_topic(topics_file='config/topics.json'):
-    """Select an available topic with weighted randomness."""
-    
-    topics_path = Path(topics_file)
-    
-    if not topics_path.exists():
+import numpy as np
+
+from _jsonio import dumps
+from _topics_cache import load_topics
+
+_RNG = np.random.default_rng()
+
+def _load_topics(topics_file):
+    """Load topics.json, exiting if it does not exist."""
+    try:
+        return load_topics(topics_file)
+    except FileNotFoundError:
         print(f"❌ Error: {topics_file} not found")
         sys.exit(1)
-    
-    with open(topics_path, 'r') as f:
-        data = json.load(f)
-    
-    # Filter available topics
+
+def _available_topics(data):
+    """Return available topics, exiting if there are none."""
     available = [t for t in data['topics'] if t['status'] == 'available']
     
     if not available:
@@ -25,6 +27,10 @@ def select_next_topic(topics_file='config/topics.json'):
         sys.exit(1)
     
     print(f"📚 Found {len(available)} available topics")
+    return available
+
+def _topic_weights(data, available):
+    """Weight selection: prefer advanced, avoid recently used categories."""
     
     # Get recently used categories to avoid repetition
     used_topics = sorted(
@@ -33,25 +39,30 @@ def select_next_topic(topics_file='config/topics.json'):
         reverse=True
     )[:3]
     
-    used_categories = [t['category'] for t in used_topics]
-    
-    # Weight selection: prefer advanced, avoid recently used categories
-    weights = []
-    for t in available:
-        weight = 1.0
-        
-        # Prefer advanced topics
-        if t['difficulty'] == 'advanced':
-            weight *= 1.5
-        
-        # Penalize recently used categories
-        if t['category'] in used_categories:
-            weight *= 0.5
-        
-        weights.append(weight)
+    used_categories = {t['category'] for t in used_topics}
+    
+    advanced = np.array([t['difficulty'] == 'advanced' for t in available])
+    recent_category = np.array([t['category'] in used_categories for t in available])
+    
+    weights = np.ones(len(available))
+    
+    # Prefer advanced topics
+    weights[advanced] *= 1.5
+    
+    # Penalize recently used categories
+    weights[recent_category] *= 0.5
+    
+    return weights
+
+def select_next_topic(topics_file='config/topics.json'):
+    """Select an available topic with weighted randomness."""
+    
+    data = _load_topics(topics_file)
+    available = _available_topics(data)
+    weights = _topic_weights(data, available)
     
     # Select topic
-    topic = random.choices(available, weights=weights, k=1)[0]
+    topic = available[int(_RNG.choice(len(available), p=weights / weights.sum()))]
     
     # Selected topic info
     print(f"\n✅ Selected: {topic['title']}")
@@ -60,12 +71,37 @@ def select_next_topic(topics_file='config/topics.json'):
     
     # Save selected topic for next script (temporary, for the pipeline)
     # This does NOT update topics.json yet
-    with open('.selected_topic.json', 'w') as f:
-        json.dump(topic, f, indent=2)
+    Path('.selected_topic.json').write_bytes(dumps(topic))
     
     return topic
 
+def select_next_topics(count, topics_file='config/topics.json'):
+    """Select up to `count` distinct available topics in one pass.
+    
+    Used by multi-topic runs; unlike select_next_topic this does not
+    write .selected_topic.json.
+    """
+    
+    data = _load_topics(topics_file)
+    available = _available_topics(data)
+    weights = _topic_weights(data, available)
+    
+    # Weighted sampling without replacement
+    picks = _RNG.choice(
+        len(available),
+        size=min(count, len(available)),
+        replace=False,
+        p=weights / weights.sum()
+    )
+    selected = [available[i] for i in picks]
+    
+    print(f"\n✅ Selected {len(selected)} topics:")
+    for topic in selected:
+        print(f"   - {topic['title']} ({topic['category']}, {topic['difficulty']})")
+    
+    return selected
+
 
 if __name__ == "__main__":
     topic = select_next_topic()
-    print(f"\n💾 Topic saved to .selected_topic.json")
\ No newline at end of file
+    print(f"\n💾 Topic saved to .selected_topic.json")
@@ -1,9 +1,9 @@
 import os
-import anthropic
-from dotenv import load_dotenv
+
+from _env import load_env
 
 # Load environment variables from .env
-load_dotenv()
+load_env()
 
 def test_connection():
     api_key = os.getenv("ANTHROPIC_API_KEY")
@@ -11,6 +11,9 @@ def test_connection():
         print("❌ Error: Please provide a valid ANTHROPIC_API_KEY in your .env file.")
         return
 
+    # Imported after the key check so a missing key fails fast
+    import anthropic
+
     client = anthropic.Anthropic(api_key=api_key)
 
     try: